@@ -1,27 +1,15 @@
 import json
-import random
 import string
-import secrets
 import time
-import re
-import collections
 import pickle
 import os
-from collections import defaultdict, Counter
+from array import array
+from collections import defaultdict
 import math
-from typing import Dict, List, Tuple, Set
 
-try:
-    import requests
-    try:
-        from requests.packages.urllib3.exceptions import InsecureRequestWarning
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-    except (ImportError, AttributeError):
-        pass
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-    print("Requests library not available. API calls will be simulated.")
+# requests is imported on first network use (see _load_requests) to keep imports fast
+requests = None
+REQUESTS_AVAILABLE = None  # Unknown until the first import attempt
 
 try:
     from urllib.parse import parse_qs, urlencode, urlparse
@@ -38,30 +26,159 @@ except ImportError:
         def urlencode(d):  # type: ignore
             return ""
 
+def _load_requests():
+    """Import requests on first use; returns None when it is not installed"""
+    global requests, REQUESTS_AVAILABLE
+    if REQUESTS_AVAILABLE is None:
+        try:
+            import requests as requests_module
+            try:
+                from requests.packages.urllib3.exceptions import InsecureRequestWarning
+                requests_module.packages.urllib3.disable_warnings(InsecureRequestWarning)
+            except (ImportError, AttributeError):
+                pass
+            requests = requests_module
+            REQUESTS_AVAILABLE = True
+        except ImportError:
+            REQUESTS_AVAILABLE = False
+            print("Requests library not available. API calls will be simulated.")
+    return requests
+
+# Statistics tables use named factories so the model can be pickled into a snapshot
+def _int_counter():
+    return defaultdict(int)
+
+def _nested_int_counter():
+    return defaultdict(_int_counter)
+
+SNAPSHOT_FORMAT_VERSION = 4
+
+def _deep_sizeof(obj, seen):
+    """Bytes held by obj and everything it references, skipping objects already in seen"""
+    import sys
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+def _format_bytes(num_bytes):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(num_bytes) < 1024:
+            return "{0:.1f} {1}".format(num_bytes, unit)
+        num_bytes /= 1024.0
+    return "{0:.1f} GiB".format(num_bytes)
+
+# Dense n-gram model layout: letters a-z map to 0-25, word boundary is 26
+NGRAM_ALPHABET_SIZE = 27
+NGRAM_BOUNDARY = 26
+NGRAM_INDEX = {letter: i for i, letter in enumerate(string.ascii_lowercase)}
+
+class _SearchTimeout(Exception):
+    """Raised inside the lookahead search when the per-guess budget runs out"""
+    pass
+
 class AdvancedHangmanAPI(object):
-    def __init__(self, access_token=None, session=None, timeout=None):
-        self.hangman_url = self.determine_hangman_url()
+    # Solver model stored in a snapshot; everything else is per-game or configuration state
+    MODEL_ATTRIBUTES = (
+        "full_dictionary", "words", "word_ids_by_length",
+        "word_length_distribution", "letter_frequency_by_length", "position_frequency",
+        "conditional_frequency", "common_prefixes", "common_suffixes",
+        "vowel_patterns", "optimal_first_letters",
+        "ngram_unigrams", "ngram_bigrams", "ngram_trigrams", "overall_letter_order",
+    )
+    
+    # Structures rebuilt or grown while playing, sized separately from the shared model
+    GAME_ATTRIBUTES = (
+        "_candidate_ids", "_materialized_candidates", "guessed_letters", "current_pattern",
+        "transposition_table",
+    )
+    
+    def __init__(self, access_token=None, session=None, timeout=None,
+                 strategy="adaptive", search_time_budget=0.05, hangman_url=None,
+                 snapshot_location=None):
+        # Candidate narrowing state: word ids into self.words, narrowed in place per guess
+        self._candidate_ids = array('I')
+        self._candidate_count = 0
+        self._candidate_key = None  # (length, guessed letters, pattern) the ids were narrowed for
+        self._materialized_candidates = None
+        self._word_id_lookup = None  # built on first assignment to current_dictionary
+        self._letter_counts = array('l', [0]) * 26
+        self._letter_last_seen = array('l', [0]) * 26  # last candidate that counted each letter
+        
+        # URL probe and session are created lazily, on the first API call
+        self._hangman_url = hangman_url
+        self._session = session
         self.access_token = access_token
-        if REQUESTS_AVAILABLE:
-            self.session = session or requests.Session()
-        else:
-            self.session = None
         self.timeout = timeout
+        self.request_delay = 0.2  # seconds slept before each API call
         self.guessed_letters = []
         
         # Initialize dictionary and statistical data
         self.full_dictionary_location = "words_250000_train.txt"
-        self.full_dictionary = self.build_dictionary(self.full_dictionary_location)
+        self.snapshot_location = snapshot_location
         
-        # Initialize data structures for advanced algorithm
-        self.initialize_statistical_data()
+        # Attach to a prebuilt snapshot when one matches, otherwise build (and save) the model
+        if not (snapshot_location and self.load_snapshot(snapshot_location)):
+            self.full_dictionary = self.build_dictionary(self.full_dictionary_location)
+            self.initialize_statistical_data()
+            if snapshot_location:
+                try:
+                    self.save_snapshot(snapshot_location)
+                except OSError as e:
+                    print("Could not write snapshot {0}: {1}".format(snapshot_location, e))
         self.current_dictionary = []
         
         # Algorithm state
         self.current_word_length = 0
         self.current_pattern = ""
         self.game_phase = "early"  # early, mid, late
+        self.max_wrong_guesses = 6
+        
+        # Strategy selection: "adaptive" (greedy phases) or "lookahead" (expectimax search)
+        self.strategy = strategy
+        self.search_time_budget = search_time_budget  # seconds per guess, narrowing included
+        self.search_time_reserve = 0.1  # fraction of the budget kept for the fallback after a timeout
+        self.max_search_depth = 3
+        self.search_branching = 6  # letters expanded per search node
+        self.lookahead_candidate_limit = 2000  # larger sets use the greedy strategy
+        self.transposition_table_limit = 200000
+        self.transposition_table = {}
+        self._transposition_settings = None  # search settings the table was filled under
+        self.last_search_depth = 0
+        self._guess_started = 0.0
+        self.search_deadline_check_interval = 128  # words partitioned between deadline checks
         
+    @property
+    def hangman_url(self):
+        # An explicit URL skips the latency probe (e.g. when replaying a recorded session)
+        if self._hangman_url is None:
+            self._hangman_url = self.determine_hangman_url()
+        return self._hangman_url
+    
+    @hangman_url.setter
+    def hangman_url(self, value):
+        self._hangman_url = value
+    
+    @property
+    def session(self):
+        if self._session is None and _load_requests() is not None:
+            self._session = requests.Session()
+        return self._session
+    
+    @session.setter
+    def session(self, value):
+        self._session = value
+    
     @staticmethod
     def determine_hangman_url():
         links = ['https://trexsim.com']
@@ -69,7 +186,7 @@ class AdvancedHangmanAPI(object):
         
         for link in links:
             try:
-                if REQUESTS_AVAILABLE:
+                if _load_requests() is not None:
                     requests.get(link)
                     for i in range(10):
                         s = time.time()
@@ -142,22 +259,82 @@ class AdvancedHangmanAPI(object):
         
         return sorted(list(set(sample_words + additional_words)))
     
+    def save_snapshot(self, snapshot_location):
+        """Write the prebuilt solver model to a single file that new processes can attach to"""
+        header = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "dictionary_state": self._dictionary_file_state(),
+        }
+        model = {name: getattr(self, name) for name in self.MODEL_ATTRIBUTES}
+        
+        # Write to a temporary file first so readers never see a partial snapshot
+        temporary_location = snapshot_location + ".tmp"
+        with open(temporary_location, "wb") as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_location, snapshot_location)
+    
+    def load_snapshot(self, snapshot_location):
+        """Attach to a prebuilt snapshot; returns False if it is missing, stale or unreadable"""
+        try:
+            with open(snapshot_location, "rb") as f:
+                header = pickle.load(f)
+                if not isinstance(header, dict) or header.get("version") != SNAPSHOT_FORMAT_VERSION:
+                    return False
+                # A snapshot is self-contained, but must not outlive a changed dictionary file
+                dictionary_state = self._dictionary_file_state()
+                if dictionary_state is not None and header.get("dictionary_state") != dictionary_state:
+                    return False
+                model = pickle.load(f)
+        except Exception:
+            # Unpickling a corrupt or foreign file can raise almost anything
+            # (ModuleNotFoundError, ValueError, MemoryError, ...); fall back to a rebuild
+            return False
+        
+        if not isinstance(model, dict) or any(name not in model for name in self.MODEL_ATTRIBUTES):
+            return False
+        for name in self.MODEL_ATTRIBUTES:
+            setattr(self, name, model[name])
+        self.transposition_table = {}
+        self._word_id_lookup = None
+        self._reset_candidates()
+        return True
+    
+    def _dictionary_file_state(self):
+        """Size and modification time of the dictionary file, or None if it does not exist"""
+        try:
+            stat = os.stat(self.full_dictionary_location)
+        except OSError:
+            return None
+        return (os.path.abspath(self.full_dictionary_location), stat.st_size, stat.st_mtime_ns)
+    
     def initialize_statistical_data(self):
         """Initialize comprehensive statistical analysis as per strategy plan"""
         print("Initializing statistical data...")
         
+        # Search results are only valid for the dictionary they were computed on
+        self.transposition_table = {}
+        
+        # Immutable lowercased words, addressed by integer word id
+        self.words = tuple(word if word.islower() else word.lower() for word in self.full_dictionary)
+        # Word ids bucketed by length, shared by filtering and statistics
+        word_ids_by_length = defaultdict(list)
+        for word_id, word in enumerate(self.words):
+            word_ids_by_length[len(word)].append(word_id)
+        self.word_ids_by_length = {length: array('I', ids) for length, ids in word_ids_by_length.items()}
+        self._word_id_lookup = None
+        self._reset_candidates()
+        
         # Phase 1.1: Dictionary Analysis Foundation
         self.word_length_distribution = defaultdict(int)
-        self.letter_frequency_by_length = defaultdict(lambda: defaultdict(int))
-        self.position_frequency = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
-        self.conditional_frequency = defaultdict(lambda: defaultdict(int))
+        self.letter_frequency_by_length = defaultdict(_int_counter)
+        self.position_frequency = defaultdict(_nested_int_counter)
+        self.conditional_frequency = defaultdict(_int_counter)
         
         # Phase 1.2: Pattern Recognition Analysis
         self.common_prefixes = defaultdict(int)
         self.common_suffixes = defaultdict(int)
-        self.bigrams = defaultdict(int)
-        self.trigrams = defaultdict(int)
-        self.vowel_patterns = defaultdict(lambda: defaultdict(int))
+        self.vowel_patterns = defaultdict(_int_counter)
         
         # Compute statistics
         self._compute_dictionary_statistics()
@@ -166,6 +343,9 @@ class AdvancedHangmanAPI(object):
         self.optimal_first_letters = {}
         self._compute_optimal_first_letters()
         
+        # Bigrams and trigrams: dense context model for the empty-candidate fallback
+        self._build_ngram_model()
+        
         print("Statistical analysis complete.")
     
     def _compute_dictionary_statistics(self):
@@ -208,15 +388,6 @@ class AdvancedHangmanAPI(object):
                 self.common_prefixes[word[:i]] += 1
                 self.common_suffixes[word[-i:]] += 1
             
-            # Bigrams and trigrams
-            for i in range(len(word) - 1):
-                if word[i].isalpha() and word[i+1].isalpha():
-                    self.bigrams[word[i:i+2]] += 1
-            
-            for i in range(len(word) - 2):
-                if all(c.isalpha() for c in word[i:i+3]):
-                    self.trigrams[word[i:i+3]] += 1
-            
             # Vowel patterns
             vowels = set('aeiou')
             vowel_pattern = ''.join(['V' if c in vowels else 'C' for c in word if c.isalpha()])
@@ -228,15 +399,16 @@ class AdvancedHangmanAPI(object):
             letter_scores = {}
             total_words = self.word_length_distribution[length]
             
+            # Count words containing each letter in a single pass over the length bucket
+            words_with_letter = defaultdict(int)
+            for word_id in self.word_ids_by_length.get(length, ()):
+                for letter in set(self.words[word_id]):
+                    words_with_letter[letter] += 1
+            
             for letter in string.ascii_lowercase:
                 # Calculate percentage of words containing this letter
-                words_with_letter = 0
-                for word in self.full_dictionary:
-                    if len(word) == length and letter in word.lower():
-                        words_with_letter += 1
-                
                 if total_words > 0:
-                    letter_scores[letter] = words_with_letter / total_words
+                    letter_scores[letter] = words_with_letter[letter] / total_words
                 else:
                     letter_scores[letter] = 0
             
@@ -244,8 +416,89 @@ class AdvancedHangmanAPI(object):
             sorted_letters = sorted(letter_scores.items(), key=lambda x: x[1], reverse=True)
             self.optimal_first_letters[length] = [letter for letter, score in sorted_letters]
     
+    def _build_ngram_model(self):
+        """Count boundary-padded unigrams, bigrams and trigrams into flat arrays"""
+        size = NGRAM_ALPHABET_SIZE
+        self.ngram_unigrams = array('I', [0]) * size
+        self.ngram_bigrams = array('I', [0]) * (size * size)
+        self.ngram_trigrams = array('I', [0]) * (size * size * size)
+        
+        for word in self.full_dictionary:
+            codes = [NGRAM_BOUNDARY]
+            codes.extend(NGRAM_INDEX.get(c, NGRAM_BOUNDARY) for c in word.lower())
+            codes.append(NGRAM_BOUNDARY)
+            
+            for i in range(1, len(codes) - 1):
+                self.ngram_unigrams[codes[i]] += 1
+            for i in range(len(codes) - 1):
+                self.ngram_bigrams[codes[i] * size + codes[i + 1]] += 1
+            for i in range(len(codes) - 2):
+                self.ngram_trigrams[(codes[i] * size + codes[i + 1]) * size + codes[i + 2]] += 1
+        
+        self._compute_overall_letter_order()
+    
+    def _compute_overall_letter_order(self):
+        """Letters ordered by overall dictionary frequency"""
+        self.overall_letter_order = sorted(
+            string.ascii_lowercase, key=lambda c: self.ngram_unigrams[NGRAM_INDEX[c]], reverse=True)
+    
+    def _ngram_letter_scores(self, clean_word):
+        """Probability that each unguessed letter fills at least one blank, from revealed neighbours"""
+        size = NGRAM_ALPHABET_SIZE
+        length = len(clean_word)
+        letters = [c for c in string.ascii_lowercase if c not in self.guessed_letters]
+        codes = [NGRAM_INDEX[c] for c in letters]
+        miss_probability = [1.0] * len(letters)
+        
+        def context(j):
+            # Boundary outside the word, letter code if revealed, None if blank
+            if j == -1 or j == length:
+                return NGRAM_BOUNDARY
+            if j < -1 or j > length or clean_word[j] == '.':
+                return None
+            return NGRAM_INDEX.get(clean_word[j], NGRAM_BOUNDARY)
+        
+        for i in range(length):
+            if clean_word[i] != '.':
+                continue
+            l2, l1, r1, r2 = context(i - 2), context(i - 1), context(i + 1), context(i + 2)
+            
+            # (weight, per-letter counts) for every context available at this blank
+            distributions = []
+            if l2 is not None and l1 is not None:
+                base = (l2 * size + l1) * size
+                distributions.append((3.0, [self.ngram_trigrams[base + c] for c in codes]))
+            if l1 is not None and r1 is not None:
+                distributions.append((3.0, [self.ngram_trigrams[(l1 * size + c) * size + r1] for c in codes]))
+            if r1 is not None and r2 is not None:
+                distributions.append((3.0, [self.ngram_trigrams[(c * size + r1) * size + r2] for c in codes]))
+            if l1 is not None:
+                distributions.append((2.0, [self.ngram_bigrams[l1 * size + c] for c in codes]))
+            if r1 is not None:
+                distributions.append((2.0, [self.ngram_bigrams[c * size + r1] for c in codes]))
+            distributions.append((1.0, [self.ngram_unigrams[c] for c in codes]))
+            
+            position_probability = [0.0] * len(codes)
+            total_weight = 0.0
+            for weight, counts in distributions:
+                total = sum(counts)
+                if total == 0:
+                    continue
+                total_weight += weight
+                for k, count in enumerate(counts):
+                    position_probability[k] += weight * count / total
+            
+            if total_weight == 0:
+                continue
+            for k, probability in enumerate(position_probability):
+                miss_probability[k] *= 1.0 - probability / total_weight
+        
+        return {letter: 1.0 - miss for letter, miss in zip(letters, miss_probability)}
+    
     def guess(self, word):
         """Main guess function implementing multi-algorithm architecture"""
+        self._guess_started = time.perf_counter()
+        
         # Clean the word pattern
         clean_word = word[::2].replace("_", ".")
         self.current_word_length = len(clean_word)
@@ -268,47 +521,123 @@ class AdvancedHangmanAPI(object):
         # Choose algorithm based on game phase and candidate count
         if self.game_phase == "early" and num_guessed == 0:
             return self._algorithm_1_length_based_frequency(clean_word)
-        elif len(self.current_dictionary) <= 10:
+        elif self.strategy == "lookahead":
+            return self._algorithm_4_lookahead_search(clean_word)
+        elif self._candidate_count <= 10:
             return self._algorithm_3_direct_pattern_matching(clean_word)
         else:
             return self._algorithm_2_conditional_probability(clean_word)
     
+    @property
+    def current_dictionary(self):
+        """Candidate words, materialized as strings only when asked for"""
+        if self._materialized_candidates is None:
+            words, ids = self.words, self._candidate_ids
+            self._materialized_candidates = [words[ids[k]] for k in range(self._candidate_count)]
+        return self._materialized_candidates
+    
+    @current_dictionary.setter
+    def current_dictionary(self, value):
+        """Replace the candidates with the given dictionary words, mapped to their word ids"""
+        self._reset_candidates()
+        words = [word.lower() for word in value]
+        if not words:
+            return
+        
+        # Word -> id lookup is only needed here, so it is built on first assignment
+        if self._word_id_lookup is None:
+            self._word_id_lookup = {word: word_id for word_id, word in enumerate(self.words)}
+        unknown = [word for word in words if word not in self._word_id_lookup]
+        if unknown:
+            raise ValueError("current_dictionary words must come from full_dictionary: {0}".format(unknown[:5]))
+        
+        ids = self._candidate_ids
+        if len(ids) < len(words):
+            ids.extend(array('I', [0]) * (len(words) - len(ids)))
+        for k, word in enumerate(words):
+            ids[k] = self._word_id_lookup[word]
+        self._candidate_count = len(words)
+    
+    @property
+    def candidate_count(self):
+        return self._candidate_count
+    
+    def _reset_candidates(self):
+        self._candidate_count = 0
+        self._candidate_key = None
+        self._materialized_candidates = None
+    
+    def _candidate_words(self):
+        """Iterate over candidate words without building a list"""
+        words, ids = self.words, self._candidate_ids
+        for k in range(self._candidate_count):
+            yield words[ids[k]]
+    
     def _update_candidate_dictionary(self, clean_word):
-        """Dynamic filtering system as per Phase 3"""
-        self.current_dictionary = []
+        """Dynamic filtering system as per Phase 3, narrowing word ids in place"""
+        length = len(clean_word)
+        guessed = tuple(self.guessed_letters)
+        previous = self._candidate_key
         
-        for dict_word in self.full_dictionary:
-            dict_word = dict_word.lower()
-            
-            # Length constraint
-            if len(dict_word) != len(clean_word):
-                continue
-            
+        # Letters that may not appear in any blank: every guess plus every revealed letter
+        excluded = set(guessed)
+        revealed = []
+        blanks = []
+        for i, c in enumerate(clean_word):
+            if c == '.':
+                blanks.append(i)
+            else:
+                revealed.append((i, c))
+                excluded.add(c)
+        
+        # Same game as last call: the new constraints only ever remove candidates, as long
+        # as every newly revealed cell holds a letter first guessed since then (a letter
+        # excluded last time showing up in a former blank would revive filtered words)
+        continuing = previous is not None and previous[0] == length and guessed[:len(previous[1])] == previous[1]
+        if continuing:
+            new_letters = set(guessed[len(previous[1]):]).difference(previous[1], previous[2])
+            continuing = all(p == c or (p == '.' and c in new_letters)
+                             for p, c in zip(previous[2], clean_word) if p != '.' or c != '.')
+        if continuing and previous[1:] == (guessed, clean_word):
+            return
+        
+        ids = self._candidate_ids
+        if not continuing:
+            # Start from the length bucket, copied into the reusable id buffer
+            bucket = self.word_ids_by_length.get(length, ())
+            if len(ids) < len(bucket):
+                ids.extend(array('I', [0]) * (len(bucket) - len(ids)))
+            ids[0:len(bucket)] = bucket if isinstance(bucket, array) else array('I', bucket)
+            self._candidate_count = len(bucket)
+        
+        # Nothing guessed or revealed yet: the whole bucket survives
+        if not excluded:
+            self._candidate_key = (length, guessed, clean_word)
+            self._materialized_candidates = None
+            return
+        
+        # Compact surviving ids towards the front of the buffer
+        words = self.words
+        kept = 0
+        for k in range(self._candidate_count):
+            word_id = ids[k]
+            word = words[word_id]
             # Pattern matching with revealed letters
-            if not re.match(clean_word, dict_word):
-                continue
-            
-            # Absence constraints - word cannot contain guessed letters that aren't in pattern
-            skip_word = False
-            for guessed_letter in self.guessed_letters:
-                if guessed_letter not in clean_word and guessed_letter in dict_word:
-                    skip_word = True
-                    break
-            
-            if skip_word:
-                continue
-            
-            # Frequency constraints - check for exact letter counts
-            revealed_letter_counts = Counter(c for c in clean_word if c != '.')
-            for letter, count in revealed_letter_counts.items():
-                if dict_word.count(letter) != count:
-                    skip_word = True
+            for i, c in revealed:
+                if word[i] != c:
                     break
-            
-            if skip_word:
-                continue
-            
-            self.current_dictionary.append(dict_word)
+            else:
+                # Absence and frequency constraints: blanks hold no guessed or revealed letter
+                for i in blanks:
+                    if word[i] in excluded:
+                        break
+                else:
+                    ids[kept] = word_id
+                    kept += 1
+        
+        self._candidate_count = kept
+        self._candidate_key = (length, guessed, clean_word)
+        self._materialized_candidates = None
     
     def _algorithm_1_length_based_frequency(self, clean_word):
         """Algorithm 1: Length-Based Frequency Strategy (Early Game)"""
@@ -323,24 +652,41 @@ class AdvancedHangmanAPI(object):
         # Fallback to general frequency
         return self._get_most_frequent_unguessed_letter()
     
+    def _count_candidate_letters(self, distinct):
+        """Fill the reusable 26-slot letter count buffer from the current candidates"""
+        counts, last_seen = self._letter_counts, self._letter_last_seen
+        for index in range(26):
+            counts[index] = 0
+            last_seen[index] = -1
+        words, ids = self.words, self._candidate_ids
+        for k in range(self._candidate_count):
+            for letter in words[ids[k]]:
+                index = ord(letter) - 97
+                if 0 <= index < 26:
+                    # Count each letter once per word unless every occurrence is wanted
+                    if distinct and last_seen[index] == k:
+                        continue
+                    last_seen[index] = k
+                    counts[index] += 1
+        return counts
+    
     def _algorithm_2_conditional_probability(self, clean_word):
         """Algorithm 2: Conditional Probability Strategy (Mid Game)"""
-        if not self.current_dictionary:
+        if not self._candidate_count:
             return self._get_most_frequent_unguessed_letter()
         
         # Calculate letter frequencies in current candidate set
-        letter_counts = defaultdict(int)
-        for word in self.current_dictionary:
-            for letter in set(word):  # Count each letter once per word
-                if letter not in self.guessed_letters:
-                    letter_counts[letter] += 1
+        letter_counts = self._count_candidate_letters(distinct=True)
         
         # Apply conditional probability based on already revealed letters
         revealed_letters = set(c for c in clean_word if c != '.')
         
         # Boost scores based on conditional frequency
-        adjusted_scores = {}
-        for letter, count in letter_counts.items():
+        best_letter, best_score = None, None
+        for index, letter in enumerate(string.ascii_lowercase):
+            count = letter_counts[index]
+            if count == 0 or letter in self.guessed_letters:
+                continue
             score = count
             
             # Apply conditional frequency boosting
@@ -349,45 +695,153 @@ class AdvancedHangmanAPI(object):
                     conditional_boost = self.conditional_frequency[revealed_letter][letter] / 1000.0
                     score += conditional_boost
             
-            adjusted_scores[letter] = score
+            if best_score is None or score > best_score:
+                best_letter, best_score = letter, score
         
         # Return letter with highest adjusted score
-        if adjusted_scores:
-            best_letter = max(adjusted_scores.items(), key=lambda x: x[1])[0]
+        if best_letter is not None:
             return best_letter
         
         return self._get_most_frequent_unguessed_letter()
     
     def _algorithm_3_direct_pattern_matching(self, clean_word):
         """Algorithm 3: Direct Pattern Matching (Late Game)"""
-        if not self.current_dictionary:
+        if not self._candidate_count:
             return self._get_most_frequent_unguessed_letter()
         
         # When few candidates remain, directly count letter frequency
-        letter_counts = defaultdict(int)
-        for word in self.current_dictionary:
-            for letter in word:
-                if letter not in self.guessed_letters:
-                    letter_counts[letter] += 1
+        letter_counts = self._count_candidate_letters(distinct=False)
         
         # Return most frequent letter in remaining candidates
-        if letter_counts:
-            return max(letter_counts.items(), key=lambda x: x[1])[0]
+        best_letter, best_count = None, 0
+        for index, letter in enumerate(string.ascii_lowercase):
+            if letter_counts[index] > best_count and letter not in self.guessed_letters:
+                best_letter, best_count = letter, letter_counts[index]
+        if best_letter is not None:
+            return best_letter
         
         return self._get_most_frequent_unguessed_letter()
     
-    def _get_most_frequent_unguessed_letter(self):
-        """Fallback to general frequency distribution"""
-        # Use overall frequency from full dictionary
-        overall_frequency = defaultdict(int)
-        for word in self.full_dictionary:
-            for letter in word.lower():
-                if letter.isalpha():
-                    overall_frequency[letter] += 1
+    def _algorithm_4_lookahead_search(self, clean_word):
+        """Algorithm 4: Depth-Limited Expectimax Lookahead (Opt-in)"""
+        candidates = self.current_dictionary
+        if not candidates:
+            return self._get_most_frequent_unguessed_letter()
+        if len(candidates) > self.lookahead_candidate_limit:
+            return self._algorithm_2_conditional_probability(clean_word)
+        
+        # Cached values depend on the search settings; drop them when those are retuned
+        settings = (self.search_branching, self.max_wrong_guesses)
+        if settings != self._transposition_settings:
+            self.transposition_table.clear()
+            self._transposition_settings = settings
+        
+        wrong_letters = frozenset(l for l in self.guessed_letters if l not in clean_word)
+        lives = self.max_wrong_guesses - len(wrong_letters)
+        # The budget runs from the start of guess(), so narrowing and the fallback count against it
+        deadline = self._guess_started + self.search_time_budget * (1.0 - self.search_time_reserve)
+        
+        # Iterative deepening: keep the answer of the deepest completed search
+        best_letter = None
+        self.last_search_depth = 0
+        for depth in range(1, self.max_search_depth + 1):
+            try:
+                _, letter = self._search_state(clean_word, wrong_letters, candidates, lives, depth, deadline)
+            except _SearchTimeout:
+                break
+            if letter is None:
+                break
+            best_letter = letter
+            self.last_search_depth = depth
+        
+        if best_letter is None:
+            return self._algorithm_2_conditional_probability(clean_word)
+        return best_letter
+    
+    def _search_state(self, pattern, wrong_letters, candidates, lives, depth, deadline):
+        """Expectimax value (estimated win probability) and best letter for a game state"""
+        if lives <= 0:
+            return 0.0, None
+        if depth == 0:
+            return self._estimate_state_value(len(candidates), lives), None
+        
+        # The state is fully determined by (length, pattern, wrong set) for a fixed dictionary
+        key = (len(pattern), pattern, wrong_letters)
+        entry = self.transposition_table.get(key)
+        if entry is not None and entry[0] >= depth:
+            return entry[1], entry[2]
+        
+        if time.perf_counter() > deadline:
+            raise _SearchTimeout()
+        
+        guessed = wrong_letters.union(pattern)
+        letter_counts = defaultdict(int)
+        for word in candidates:
+            for letter in set(word):
+                if letter not in guessed:
+                    letter_counts[letter] += 1
+        
+        if not letter_counts:
+            return 0.0, None
+        
+        # Only one word left: any of its hidden letters wins
+        if len(candidates) == 1:
+            return 1.0, max(letter_counts)
         
-        sorted_letters = sorted(overall_frequency.items(), key=lambda x: x[1], reverse=True)
+        ordered_letters = sorted(letter_counts.items(), key=lambda x: x[1], reverse=True)
+        total = len(candidates)
+        best_value, best_letter = -1.0, None
         
-        for letter, _ in sorted_letters:
+        check_interval = self.search_deadline_check_interval
+        for letter, _ in ordered_letters[:self.search_branching]:
+            # Partition candidates by the pattern this letter would reveal
+            partitions = defaultdict(list)
+            for i, word in enumerate(candidates):
+                if i % check_interval == 0 and time.perf_counter() > deadline:
+                    raise _SearchTimeout()
+                child_pattern = ''.join(c if c == letter else p for c, p in zip(word, pattern))
+                partitions[child_pattern].append(word)
+            
+            value = 0.0
+            for child_pattern, child_candidates in partitions.items():
+                probability = len(child_candidates) / total
+                if child_pattern == pattern:
+                    child_value, _ = self._search_state(
+                        pattern, wrong_letters | {letter}, child_candidates, lives - 1, depth - 1, deadline)
+                elif '.' not in child_pattern:
+                    child_value = 1.0
+                else:
+                    child_value, _ = self._search_state(
+                        child_pattern, wrong_letters, child_candidates, lives, depth - 1, deadline)
+                value += probability * child_value
+            
+            if value > best_value:
+                best_value, best_letter = value, letter
+        
+        if len(self.transposition_table) >= self.transposition_table_limit:
+            self.transposition_table.clear()
+        self.transposition_table[key] = (depth, best_value, best_letter)
+        return best_value, best_letter
+    
+    @staticmethod
+    def _estimate_state_value(num_candidates, lives):
+        """Leaf heuristic: more lives and fewer candidates mean a likelier win"""
+        if num_candidates <= 1:
+            return 1.0
+        return lives / (lives + math.log2(num_candidates))
+    
+    def _get_most_frequent_unguessed_letter(self):
+        """Fallback to the n-gram context model, then general frequency distribution"""
+        # Score blanks from their revealed neighbours when the pattern is known
+        if '.' in self.current_pattern:
+            letter_scores = self._ngram_letter_scores(self.current_pattern)
+            if letter_scores:
+                best_letter, best_score = max(letter_scores.items(), key=lambda x: x[1])
+                if best_score > 0:
+                    return best_letter
+        
+        # Use precomputed overall frequency from full dictionary
+        for letter in self.overall_letter_order:
             if letter not in self.guessed_letters:
                 return letter
         
@@ -421,10 +875,97 @@ class AdvancedHangmanAPI(object):
         
         return current_entropy - expected_entropy
     
+    # Memory accounting
+    def memory_report(self):
+        """Deep size in bytes of each model and per-game structure.
+        
+        Objects referenced by an earlier structure are counted only once, so
+        per-game figures exclude words shared with the model.
+        """
+        seen = set()
+        model = {name: _deep_sizeof(getattr(self, name, None), seen) for name in self.MODEL_ATTRIBUTES}
+        game = {name: _deep_sizeof(getattr(self, name, None), seen) for name in self.GAME_ATTRIBUTES}
+        return {
+            "model": model,
+            "game": game,
+            "model_total": sum(model.values()),
+            "game_total": sum(game.values()),
+        }
+    
+    def profile_memory(self, play_games=None, top_allocations=5):
+        """Track peak allocation with tracemalloc while rebuilding statistics and playing games.
+        
+        Both phases run on a detached copy, so this instance keeps its model and game state.
+        play_games is called with that copy (e.g. to run a simulator or replay a recorded
+        session); the game phase is skipped when it is None.
+        """
+        import dis
+        import tracemalloc
+        
+        profiler = self._detached_copy()
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        
+        def measure(phase):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            start_snapshot = tracemalloc.take_snapshot()
+            phase()
+            after, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().filter_traces(own_frames).compare_to(
+                start_snapshot.filter_traces(own_frames), "lineno")
+            growth = sorted((stat for stat in statistics if stat.size_diff > 0),
+                            key=lambda stat: stat.size_diff, reverse=True)
+            return {
+                "peak": peak - before,
+                "retained": after - before,
+                "top_allocations": [(str(stat.traceback), stat.size_diff) for stat in growth[:top_allocations]],
+            }
+        
+        # Hide the profiler's own snapshots so only the measured phase is reported
+        own_frames = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        own_frames += [tracemalloc.Filter(False, __file__, lineno) for _, lineno in dis.findlinestarts(measure.__code__)]
+        
+        try:
+            initialization = measure(profiler.initialize_statistical_data)
+            game = None
+            if play_games is not None:
+                game = measure(lambda: play_games(profiler))
+                game["structures"] = profiler.memory_report()["game"]
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+        
+        report = self.memory_report()
+        report["initialize_statistical_data"] = initialization
+        report["game_play"] = game
+        try:
+            import resource
+            import sys
+            # ru_maxrss is in bytes on macOS and KiB on Linux and the BSDs
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report["peak_rss"] = peak_rss if sys.platform == "darwin" else peak_rss * 1024
+        except ImportError:
+            report["peak_rss"] = None
+        return report
+    
+    def _detached_copy(self):
+        """Copy sharing configuration and model but with its own per-game and search state"""
+        import copy
+        detached = copy.copy(self)
+        detached.guessed_letters = []
+        detached.transposition_table = {}
+        detached._candidate_ids = array('I')
+        detached._letter_counts = array('l', [0]) * 26
+        detached._letter_last_seen = array('l', [0]) * 26
+        detached._reset_candidates()
+        return detached
+    
     # API interaction methods (same as original)
     def start_game(self, practice=True, verbose=True):
         self.guessed_letters = []
-        self.current_dictionary = self.full_dictionary
+        self.current_dictionary = []
                          
         response = self.request("/new_game", {"practice": practice})
         if response.get('status') == "approved":
@@ -440,7 +981,7 @@ class AdvancedHangmanAPI(object):
                 
                 if verbose:
                     print("Guessing letter: {0}".format(guess_letter))
-                    print("Current candidates: {0}".format(len(self.current_dictionary)))
+                    print("Current candidates: {0}".format(self.candidate_count))
                     print("Game phase: {0}".format(self.game_phase))
                     
                 try:    
@@ -488,12 +1029,13 @@ class AdvancedHangmanAPI(object):
             elif "access_token" not in args:
                 args["access_token"] = self.access_token
 
-        time.sleep(0.2)
+        if self.request_delay:
+            time.sleep(self.request_delay)
 
         num_retry, time_sleep = 50, 2
         for it in range(num_retry):
             try:
-                if not REQUESTS_AVAILABLE or self.session is None:
+                if self.session is None:
                     # Mock response for testing
                     class MockResponse:
                         def __init__(self):
@@ -512,8 +1054,13 @@ class AdvancedHangmanAPI(object):
                         verify=False
                     )
                 break
+            except ReplayMismatchError:
+                # A replayed client diverged from its log; retrying or wrapping would loop forever
+                raise
             except Exception as e:
-                if REQUESTS_AVAILABLE and hasattr(requests, 'exceptions') and isinstance(e, requests.exceptions.SSLError):
+                # Replayed sessions may raise requests errors before requests was loaded here
+                requests_module = _load_requests()
+                if requests_module is not None and hasattr(requests_module, 'exceptions') and isinstance(e, requests_module.exceptions.SSLError):
                     if it + 1 == num_retry:
                         raise
                     time.sleep(time_sleep)
@@ -571,10 +1118,196 @@ class HangmanAPIError(Exception):
 
         Exception.__init__(self, self.message)
 
+class ReplayMismatchError(Exception):
+    """Raised when a replayed client issues a request the log does not contain"""
+    pass
+
+def _open_session_log(location, mode):
+    """Open a session log as text, gzip-compressed when the name ends in .gz"""
+    if location.endswith(".gz"):
+        import gzip
+        return gzip.open(location, mode + "t", encoding="utf-8")
+    return open(location, mode, encoding="utf-8")
+
+def _loggable_args(args):
+    """Request arguments as stored in a session log, without the access token"""
+    if not args:
+        return {}
+    return json.loads(json.dumps({k: v for k, v in args.items() if k != "access_token"}))
+
+def _exception_from_log(error_type, message):
+    """Rebuild a recorded exception as its original class, or ConnectionError if not allowlisted.
+    
+    Only builtin exceptions, requests.exceptions and this module's own errors are
+    rebuilt; a log file never causes a module to be imported.
+    """
+    import builtins
+    try:
+        module_name, qualified_name = error_type
+    except (TypeError, ValueError):
+        return ConnectionError(message)
+    
+    if module_name == "builtins":
+        namespace = vars(builtins)
+    elif module_name == "requests.exceptions" and _load_requests() is not None:
+        namespace = vars(requests.exceptions)
+    elif module_name in (__name__, "improved_hangman", "__main__"):
+        namespace = {"HangmanAPIError": HangmanAPIError, "ReplayMismatchError": ReplayMismatchError}
+    else:
+        return ConnectionError(message)
+    
+    exception_class = namespace.get(qualified_name)
+    if isinstance(exception_class, type) and issubclass(exception_class, Exception):
+        try:
+            return exception_class(message)
+        except Exception:
+            pass
+    return ConnectionError(message)
+
+class RecordedResponse(object):
+    """Minimal response object served from a session log"""
+    def __init__(self, status_code, content_type, text):
+        self.status_code = status_code
+        self.headers = {'content-type': content_type}
+        self.text = text
+    
+    def json(self):
+        return json.loads(self.text)
+
+class RecordingSession(object):
+    """Session wrapper that logs every request and response with timings (one JSON object per line)"""
+    def __init__(self, session, log_location):
+        self.session = session
+        self.log_location = log_location
+        self._log = _open_session_log(log_location, "w")
+        self._start = time.perf_counter()
+    
+    def request(self, method, url, params=None, data=None, **kwargs):
+        entry = {
+            "offset": time.perf_counter() - self._start,
+            "method": method,
+            "path": urlparse(url).path,
+            "params": _loggable_args(params),
+            "data": _loggable_args(data),
+        }
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, params=params, data=data, **kwargs)
+        except Exception as e:
+            entry["elapsed"] = time.perf_counter() - start
+            entry["error"] = str(e)
+            entry["error_type"] = [type(e).__module__, type(e).__qualname__]
+            self._write(entry)
+            raise
+        entry["elapsed"] = time.perf_counter() - start
+        entry["status"] = getattr(response, "status_code", 200)
+        entry["content_type"] = response.headers.get('content-type', '')
+        entry["text"] = response.text
+        self._write(entry)
+        return response
+    
+    def _write(self, entry):
+        self._log.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._log.flush()
+    
+    def close(self):
+        self._log.close()
+
+class ReplaySession(object):
+    """Session that serves recorded responses in order, at recorded speed or as fast as possible.
+    
+    With realtime=True each request sleeps for its recorded server latency ("elapsed"), so
+    the client's own time adds on top; the recorded gaps between requests ("offset") are not
+    reproduced, as they mostly reflect the recording client's overhead.
+    """
+    def __init__(self, log_location, realtime=False):
+        with _open_session_log(log_location, "r") as f:
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        self.realtime = realtime
+        self.position = 0
+    
+    @property
+    def exhausted(self):
+        return self.position >= len(self.entries)
+    
+    @property
+    def recorded_server_time(self):
+        """Total server-side time captured in the log, in seconds"""
+        return sum(entry.get("elapsed", 0) for entry in self.entries)
+    
+    def request(self, method, url, params=None, data=None, **kwargs):
+        if self.exhausted:
+            raise ReplayMismatchError("Session log exhausted at {0} {1}".format(method, url))
+        entry = self.entries[self.position]
+        
+        request_key = (method, urlparse(url).path, _loggable_args(params), _loggable_args(data))
+        recorded_key = (entry["method"], entry["path"], entry["params"], entry["data"])
+        if request_key != recorded_key:
+            raise ReplayMismatchError("Request {0} does not match recorded {1} (entry {2})".format(
+                request_key, recorded_key, self.position))
+        self.position += 1
+        
+        if self.realtime:
+            time.sleep(entry.get("elapsed", 0))
+        if "error" in entry:
+            raise _exception_from_log(entry.get("error_type"), entry["error"])
+        return RecordedResponse(entry["status"], entry["content_type"], entry["text"])
+
 # Example usage
 if __name__ == "__main__":
+    import argparse
+    
+    # Use the importable module so pickled snapshots reference improved_hangman, not __main__
+    from improved_hangman import AdvancedHangmanAPI, ReplaySession, _format_bytes
+    
+    parser = argparse.ArgumentParser(description="Play practice games with the improved hangman algorithm")
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="attach to a prebuilt model snapshot, creating it if missing or stale")
+    parser.add_argument("--build-snapshot", metavar="PATH",
+                        help="build a model snapshot at PATH and exit")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print per-structure memory usage and peak allocations, then exit")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="with --memory-report, profile the games in a recorded session log")
+    args = parser.parse_args()
+    
+    if args.memory_report:
+        profiler = AdvancedHangmanAPI(hangman_url="https://trexsim.com/trexsim/hangman",
+                                      snapshot_location=args.snapshot)
+        play_games = None
+        if args.replay:
+            # Play every game in a recorded session log through the normal API loop
+            replay = ReplaySession(args.replay)
+            def play_games(api):
+                api.session, api.request_delay = replay, 0
+                while not replay.exhausted:
+                    api.start_game(practice=True, verbose=False)
+        report = profiler.profile_memory(play_games=play_games)
+        for section in ("model", "game"):
+            print("{0} structures ({1} total):".format(section.capitalize(), _format_bytes(report[section + "_total"])))
+            for name, size in sorted(report[section].items(), key=lambda x: x[1], reverse=True):
+                print("  {0:<28} {1:>12}".format(name, _format_bytes(size)))
+        for phase in ("initialize_statistical_data", "game_play"):
+            if report[phase] is None:
+                print("Peak allocation during {0}: skipped (pass --replay LOG to play recorded games)".format(phase))
+                continue
+            print("Peak allocation during {0}: {1} (retained {2})".format(
+                phase, _format_bytes(report[phase]["peak"]), _format_bytes(report[phase]["retained"])))
+            for location, size in report[phase]["top_allocations"]:
+                print("  {0:<40} {1:>12}".format(location, _format_bytes(size)))
+        if report["peak_rss"]:
+            print("Process peak RSS: {0}".format(_format_bytes(report["peak_rss"])))
+        raise SystemExit(0)
+    
+    if args.build_snapshot:
+        builder = AdvancedHangmanAPI(hangman_url="unused")
+        builder.save_snapshot(args.build_snapshot)
+        print("Snapshot written to {0}".format(args.build_snapshot))
+        raise SystemExit(0)
+    
     # Initialize the improved API
-    api = AdvancedHangmanAPI(access_token="e4a58ba7e054be19f90498a91cd47c", timeout=2000)
+    api = AdvancedHangmanAPI(access_token="e4a58ba7e054be19f90498a91cd47c", timeout=2000,
+                             snapshot_location=args.snapshot)
     
     # Run practice games
     print("Starting practice games with improved algorithm...")
@@ -4,17 +4,33 @@ Test script for the improved Hangman algorithm.
 This script simulates hangman games locally to test the algorithm without using API calls.
 """
 
+import json
+import os
 import random
-from improved_hangman import AdvancedHangmanAPI
+import re
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from improved_hangman import (AdvancedHangmanAPI, RecordedResponse, RecordingSession, ReplayMismatchError,
+                              ReplaySession)
 
 class HangmanSimulator:
     """Local simulator for testing the hangman algorithm"""
     
     def __init__(self, dictionary):
         self.dictionary = [word.lower() for word in dictionary]
+        self.guess_latencies = []
         
-    def simulate_game(self, target_word, algorithm, max_wrong_guesses=6, verbose=False):
-        """Simulate a single hangman game"""
+    def simulate_game(self, target_word, algorithm, max_wrong_guesses=6, verbose=False, guess_hook=None):
+        """Simulate a single hangman game.
+        
+        guess_hook(algorithm, word_display), if given, is called in place of
+        algorithm.guess so callers can instrument each guess.
+        """
         target_word = target_word.lower()
         guessed_letters = []
         wrong_guesses = 0
@@ -34,7 +50,12 @@ class HangmanSimulator:
             algorithm.guessed_letters = guessed_letters[:]
             
             # Get guess from algorithm
-            guess = algorithm.guess(word_display)
+            start = time.perf_counter()
+            if guess_hook is None:
+                guess = algorithm.guess(word_display)
+            else:
+                guess = guess_hook(algorithm, word_display)
+            self.guess_latencies.append(time.perf_counter() - start)
             
             if guess in guessed_letters:
                 if verbose:
@@ -128,6 +149,243 @@ class HangmanSimulator:
         
         return success_rate
 
+class LocalHangmanSession:
+    """Offline stand-in for the hangman server, used to produce session logs"""
+    
+    def __init__(self, words, max_wrong_guesses=6):
+        self.words = list(words)
+        self.max_wrong_guesses = max_wrong_guesses
+        self.games = {}
+        
+    def request(self, method, url, params=None, data=None, **kwargs):
+        params = params or {}
+        if url.endswith("/new_game"):
+            game_id = str(len(self.games))
+            self.games[game_id] = {'word': self.words[len(self.games) % len(self.words)],
+                                   'guessed': set(), 'tries': self.max_wrong_guesses}
+            result = {'status': 'approved', 'game_id': game_id,
+                      'word': self._display(self.games[game_id]), 'tries_remains': self.max_wrong_guesses}
+        elif url.endswith("/guess_letter"):
+            game = self.games[params['game_id']]
+            letter = params['letter']
+            game['guessed'].add(letter)
+            if letter not in game['word']:
+                game['tries'] -= 1
+            display = self._display(game)
+            if '_' not in display:
+                status = 'success'
+            elif game['tries'] <= 0:
+                status = 'failed'
+            else:
+                status = 'ongoing'
+            result = {'status': status, 'game_id': params['game_id'],
+                      'word': display, 'tries_remains': game['tries']}
+        else:
+            result = {'error': 'unknown path'}
+        return RecordedResponse(200, 'application/json', json.dumps(result))
+    
+    @staticmethod
+    def _display(game):
+        return ' '.join(c if c in game['guessed'] else '_' for c in game['word'])
+
+REPLAY_URL = "https://trexsim.com/trexsim/hangman"
+
+def benchmark_record_replay(api, words):
+    """Record games against the local server, then replay the log with no network"""
+    log_location = os.path.join(tempfile.mkdtemp(), "session.jsonl.gz")
+    original_session, original_delay, original_url = api._session, api.request_delay, api._hangman_url
+    # A fixed URL keeps recording and replay from probing the live servers
+    api.request_delay, api.hangman_url = 0, REPLAY_URL
+    
+    recorder = RecordingSession(LocalHangmanSession(words), log_location)
+    api.session = recorder
+    recorded_wins = sum(1 for _ in words if api.start_game(practice=True, verbose=False))
+    recorder.close()
+    
+    replay = ReplaySession(log_location)
+    api.session = replay
+    start = time.perf_counter()
+    replayed_wins = sum(1 for _ in words if api.start_game(practice=True, verbose=False))
+    elapsed = time.perf_counter() - start
+    
+    # A client that diverges from the log must fail instead of retrying forever
+    api.guess = lambda word: next(c for c in "zqxjkvbwyfgmpuhcdlnrtosiea" if c not in api.guessed_letters)
+    api.session = ReplaySession(log_location)
+    try:
+        api.start_game(practice=True, verbose=False)
+        raise AssertionError("diverging replay did not raise ReplayMismatchError")
+    except ReplayMismatchError:
+        pass
+    finally:
+        del api.guess
+    
+    api._session, api.request_delay, api._hangman_url = original_session, original_delay, original_url
+    print(f"Recorded {len(replay.entries)} requests ({os.path.getsize(log_location)} bytes compressed)")
+    print(f"Replayed {len(words)} games: wins {replayed_wins}/{len(words)} (recorded {recorded_wins}), "
+          f"client time {elapsed * 1000:.1f} ms, "
+          f"{elapsed * 1000 / max(len(replay.entries), 1):.3f} ms per request, fully consumed: {replay.exhausted}")
+    return elapsed
+
+STARTUP_PROBE = """
+import time
+start = time.perf_counter()
+import improved_hangman
+imported = time.perf_counter()
+api = improved_hangman.AdvancedHangmanAPI(snapshot_location={snapshot!r})
+api.guess(' '.join('_' * 5))
+print((imported - start) * 1000, (time.perf_counter() - start) * 1000)
+"""
+
+def measure_startup(dictionary_location):
+    """Import time and time to first guess in a fresh process, with and without a snapshot"""
+    # Probes run in an empty directory holding only the dictionary, so nothing cached
+    # by earlier runs can make the cold build look faster than it is
+    work_dir = tempfile.mkdtemp()
+    shutil.copy2(dictionary_location, os.path.join(work_dir, os.path.basename(dictionary_location)))
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [module_dir, os.environ.get("PYTHONPATH")])))
+    
+    def run(*args):
+        return subprocess.run([sys.executable, *args], cwd=work_dir, env=env,
+                              capture_output=True, text=True, check=True).stdout
+    
+    results = {}
+    output = run("-c", STARTUP_PROBE.format(snapshot=None))
+    results["cold build"] = tuple(map(float, output.strip().splitlines()[-1].split()))
+    
+    run(os.path.join(module_dir, "improved_hangman.py"), "--build-snapshot", "model.snapshot")
+    output = run("-c", STARTUP_PROBE.format(snapshot="model.snapshot"))
+    results["snapshot"] = tuple(map(float, output.strip().splitlines()[-1].split()))
+    
+    for label, (import_ms, first_guess_ms) in results.items():
+        print(f"  {label:<10} import: {import_ms:.1f} ms  time to first guess: {first_guess_ms:.1f} ms")
+    return results
+
+def reference_candidates(dictionary, guessed_letters, clean_word):
+    """The original regex and letter-count filter, kept as the reference for narrowing"""
+    revealed_letter_counts = Counter(c for c in clean_word if c != '.')
+    candidates = []
+    for dict_word in dictionary:
+        dict_word = dict_word.lower()
+        if len(dict_word) != len(clean_word) or not re.match(clean_word, dict_word):
+            continue
+        if any(letter not in clean_word and letter in dict_word for letter in guessed_letters):
+            continue
+        if any(dict_word.count(letter) != count for letter, count in revealed_letter_counts.items()):
+            continue
+        candidates.append(dict_word)
+    return candidates
+
+def check_candidate_filter(api, num_states=3000, seed=0):
+    """Compare incremental candidate narrowing with the reference filter on random states.
+    
+    States follow random games, but cells may be revealed later than their letter was
+    guessed, which exercises the restart from the length bucket as well as continuation.
+    """
+    rng = random.Random(seed)
+    dictionary = api.full_dictionary
+    # A state the incremental path once got wrong: an old guess revealed in a former blank
+    states = [(['e'], '.e...'), (['e', 'a'], '.e.e.')] if 'never' in dictionary else []
+    while len(states) < num_states:
+        target = rng.choice(dictionary).lower()
+        letters = rng.sample(string.ascii_lowercase, rng.randint(1, 12))
+        revealed = set()
+        for step in range(1, len(letters) + 1):
+            guessed = letters[:step]
+            hidden = [i for i, c in enumerate(target) if c in guessed and i not in revealed]
+            revealed.update(rng.sample(hidden, rng.randint(0, len(hidden))) if rng.random() < 0.3 else hidden)
+            states.append((guessed, ''.join(c if i in revealed else '.' for i, c in enumerate(target))))
+    
+    original_guessed = api.guessed_letters
+    try:
+        for guessed, clean_word in states[:num_states]:
+            api.guessed_letters = list(guessed)
+            api._update_candidate_dictionary(clean_word)
+            expected = reference_candidates(dictionary, guessed, clean_word)
+            if api.current_dictionary != expected:
+                raise AssertionError(f"candidates for {guessed} {clean_word!r}: "
+                                     f"{api.current_dictionary} != {expected}")
+    finally:
+        api.guessed_letters = original_guessed
+        api._reset_candidates()
+    print(f"  {num_states} states match the reference filter")
+    return num_states
+
+MAX_RETAINED_BLOCKS_PER_GUESS = 4
+
+def measure_allocations_per_guess(api, simulator, words, max_retained_blocks=MAX_RETAINED_BLOCKS_PER_GUESS):
+    """Count memory allocated and blocks retained while each guess is made.
+    
+    Peak bytes come from tracemalloc; retained blocks are sys.getallocatedblocks()
+    deltas with the garbage collector paused. Interpreter free lists keep about one
+    block per guess alive, so the check fails only when the mean exceeds max_retained_blocks.
+    Lookahead retains its transposition table by design and is not checked here.
+    """
+    import gc
+    import tracemalloc
+    
+    peak_bytes = []
+    retained_blocks = []
+    
+    def instrumented_guess(algorithm, word_display):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        blocks_before = sys.getallocatedblocks()
+        guess = algorithm.guess(word_display)
+        retained_blocks.append(sys.getallocatedblocks() - blocks_before)
+        peak_bytes.append(tracemalloc.get_traced_memory()[1] - before)
+        return guess
+    
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        for word in words:
+            simulator.simulate_game(word, api, guess_hook=instrumented_guess)
+    finally:
+        tracemalloc.stop()
+        if gc_was_enabled:
+            gc.enable()
+    
+    guesses = max(len(peak_bytes), 1)
+    mean_peak = sum(peak_bytes) / guesses
+    mean_blocks = sum(retained_blocks) / guesses
+    print(f"  {len(peak_bytes)} guesses: peak allocation per guess mean {mean_peak / 1024:.1f} KiB, "
+          f"max {max(peak_bytes or [0]) / 1024:.1f} KiB")
+    print(f"  Retained blocks per guess: mean {mean_blocks:.2f}, max {max(retained_blocks or [0])} "
+          f"(limit {max_retained_blocks})")
+    if api.strategy != "lookahead" and mean_blocks > max_retained_blocks:
+        raise AssertionError(f"guesses retain {mean_blocks:.2f} blocks on average, "
+                             f"more than {max_retained_blocks}")
+    return mean_peak
+
+def compare_strategies(api, simulator, words, strategies=("adaptive", "lookahead")):
+    """Report win rate and per-guess latency for each selectable strategy"""
+    print(f"Search budget: {api.search_time_budget * 1000:.0f} ms per guess")
+    original_strategy = api.strategy
+    results = {}
+    
+    for strategy in strategies:
+        api.strategy = strategy
+        simulator.guess_latencies = []
+        wins = 0
+        for word in words:
+            success, _, _ = simulator.simulate_game(word, api, verbose=False)
+            if success:
+                wins += 1
+        
+        latencies = sorted(simulator.guess_latencies)
+        win_rate = wins / len(words) if words else 0
+        mean_ms = 1000 * sum(latencies) / len(latencies) if latencies else 0
+        max_ms = 1000 * latencies[-1] if latencies else 0
+        p95_ms = 1000 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0
+        results[strategy] = win_rate
+        print(f"  {strategy:<10} win rate: {win_rate:.3f} ({wins}/{len(words)})  "
+              f"latency mean: {mean_ms:.2f} ms  p95: {p95_ms:.2f} ms  max: {max_ms:.2f} ms")
+    
+    api.strategy = original_strategy
+    return results
+
 def main():
     """Main test function"""
     print("Initializing Advanced Hangman Algorithm...")
@@ -181,6 +439,7 @@ def main():
         "lymph", "nymph", "psych", "crypt", "myths"
     ]
     
+    unseen_words = [w for w in challenging_words if w not in dictionary]
     challenging_words = [w for w in challenging_words if w in dictionary]
     if challenging_words:
         print(f"Testing {len(challenging_words)} challenging words...")
@@ -193,6 +452,72 @@ def main():
         challenging_rate = challenging_wins / len(challenging_words)
         print(f"Challenging words success rate: {challenging_rate:.3f} ({challenging_wins}/{len(challenging_words)})")
     
+    # Words outside the dictionary exercise the n-gram fallback path
+    if unseen_words:
+        print(f"Testing {len(unseen_words)} out-of-dictionary words (n-gram fallback)...")
+        simulator.guess_latencies = []
+        unseen_wins = 0
+        for word in unseen_words:
+            success, _, _ = simulator.simulate_game(word, api, verbose=False)
+            if success:
+                unseen_wins += 1
+        
+        unseen_rate = unseen_wins / len(unseen_words)
+        mean_ms = 1000 * sum(simulator.guess_latencies) / len(simulator.guess_latencies)
+        print(f"Out-of-dictionary success rate: {unseen_rate:.3f} ({unseen_wins}/{len(unseen_words)}), "
+              f"mean guess latency: {mean_ms:.2f} ms")
+    
+    # Compare greedy and lookahead strategies under the per-guess time budget
+    print(f"\n{'='*60}")
+    print("COMPARING GUESSING STRATEGIES")
+    print(f"{'='*60}")
+    
+    comparison_words = challenging_words or random.sample(simulator.dictionary, min(50, len(simulator.dictionary)))
+    compare_strategies(api, simulator, comparison_words)
+    
+    # Incremental narrowing must agree with a full rescan
+    print(f"\n{'='*60}")
+    print("CANDIDATE FILTER EQUIVALENCE")
+    print(f"{'='*60}")
+    
+    check_candidate_filter(api)
+    
+    # Transient memory churn while narrowing candidates
+    print(f"\n{'='*60}")
+    print("ALLOCATIONS PER GUESS")
+    print(f"{'='*60}")
+    
+    measure_allocations_per_guess(api, simulator, random.sample(simulator.dictionary, min(20, len(simulator.dictionary))))
+    
+    # Fresh-process startup cost, building the model versus attaching to a snapshot
+    print(f"\n{'='*60}")
+    print("STARTUP TIME")
+    print(f"{'='*60}")
+    
+    measure_startup(api.full_dictionary_location)
+    
+    # Per-structure memory accounting and peak allocations
+    print(f"\n{'='*60}")
+    print("MEMORY PROFILE")
+    print(f"{'='*60}")
+    
+    profile_words = random.sample(simulator.dictionary, min(10, len(simulator.dictionary)))
+    report = api.profile_memory(
+        play_games=lambda profiled_api: [simulator.simulate_game(word, profiled_api) for word in profile_words])
+    largest = sorted(report['model'].items(), key=lambda x: x[1], reverse=True)[:3]
+    print(f"Model: {report['model_total'] / 1024:.1f} KiB "
+          f"(largest: {', '.join(f'{name} {size / 1024:.1f} KiB' for name, size in largest)})")
+    print(f"Per-game structures: {report['game_total'] / 1024:.1f} KiB")
+    print(f"Peak during initialize_statistical_data: {report['initialize_statistical_data']['peak'] / 1024:.1f} KiB")
+    print(f"Peak during game play: {report['game_play']['peak'] / 1024:.1f} KiB")
+    
+    # End-to-end client overhead through request(), reproducible and offline
+    print(f"\n{'='*60}")
+    print("RECORD/REPLAY BENCHMARK")
+    print(f"{'='*60}")
+    
+    benchmark_record_replay(api, random.sample(simulator.dictionary, min(20, len(simulator.dictionary))))
+    
     print(f"\n{'='*60}")
     print("TEST COMPLETE")
     print(f"{'='*60}")